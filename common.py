@@ -0,0 +1,37 @@
+import os
+
+MTS_FILE_ENDING = ".MTS"
+MOV_FILE_ENDING = ".mov"
+
+def scan_files(directory, ending, prune=()):
+    # prune contains absolute pathes of directories that are not descended into.
+    dirs_to_scan = [directory]
+    while dirs_to_scan:
+        try:
+            entries = os.scandir(dirs_to_scan.pop())
+        except OSError:
+            continue # Skip unreadable directories like os.walk() does.
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if not prune or os.path.abspath(entry.path) not in prune:
+                        dirs_to_scan.append(entry.path)
+                elif entry.name.endswith(ending):
+                    yield entry
+
+def find_files(directory, ending, prune=()):
+    # Returns (file name base, path) tuples.
+    return [(entry.name[:-len(ending)], entry.path) for entry in scan_files(directory, ending, prune)]
+
+def find_files_with_stat(directory, ending, prune=()):
+    # Returns (file name base, path, stat) tuples.
+    # DirEntry.stat() only comes with the directory listing on Windows. On Unix it makes one system call per file.
+    files_with_stat = []
+    for entry in scan_files(directory, ending, prune):
+        try:
+            stat = entry.stat()
+        except OSError as e:
+            print("Could not stat {}: {}".format(entry.path, e.strerror))
+            stat = None
+        files_with_stat.append((entry.name[:-len(ending)], entry.path, stat))
+    return files_with_stat
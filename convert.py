@@ -1,36 +1,133 @@
 #!/usr/bin/env python3
 
 import argparse
+import collections
+import itertools
 import os
+import shlex
 import subprocess
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from common import MTS_FILE_ENDING, MOV_FILE_ENDING, find_files_with_stat
+
+TMP_FILE_ENDING = ".part"
+# With -nostdin, ffmpeg leaves the terminal settings alone. Otherwise overlapping or killed processes restore the wrong settings.
+FFMPEG_CMD = ["ffmpeg", "-nostdin", "-loglevel", "24", "-y"]
+FFMPEG_OUTPUT_FORMAT_OPTIONS = ["-f", "mov"]
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Converts AVCHD recordings from Panasonic HMC150 for editing (DNxHD) or viewing / sharing (MP4).")
     parser.add_argument("dir", type=str, help="The directory which contains .MTS files somewhere.")
     parser.add_argument("-s", "--for-sharing", action="store_true", help="Convert to MP4 (much smaller files for e. g. Google Drive.")
     parser.add_argument("--deinterlace", action="store_true", help="Add deinterlacing step.")
+    parser.add_argument("-f", "--force", action="store_true", help="Also convert files that have already been converted.")
+    parser.add_argument("-j", "--jobs", type=int, default=max(1, (os.cpu_count() or 1) // 2), help="Number of files to convert in parallel.")
     return parser.parse_args()
 
-def find_mts_file_pathes(directory):
-    mts_file_pathes = []
-    for d_path, _, f_names in os.walk(directory):
-        for f_name in f_names:
-            f_path = os.path.join(d_path, f_name)
-            if f_path.endswith(".MTS"):
-                mts_file_pathes += [f_path]
-    return sorted(mts_file_pathes)
-
-def convert_mts_files(mts_file_pathes, ffmpeg_options_string, out_dir):
-    ffmpeg_options = ffmpeg_options_string.split(" ")
-    for mts_file_path in mts_file_pathes:
-        _, mts_file_name = os.path.split(mts_file_path)
-        mov_file_path = os.path.join(out_dir, mts_file_name[:-4] + ".mov") # Replace ending.
-        cmd = "ffmpeg -loglevel 24 -y -i".split(" ") + [mts_file_path] + ffmpeg_options + "-f mov".split(" ") + [mov_file_path]
-        print(" ".join(cmd))
-        res = subprocess.run(cmd)
-        if res.returncode != 0:
-            print("ffmpeg returned an error! Aborting.")
-            exit(1)
+def get_mov_file_path(fn_base, out_dir):
+    return os.path.join(out_dir, fn_base + MOV_FILE_ENDING)
+
+def filter_name_clashes(mts_files_with_stat):
+    # All outputs go into one directory. Clips with the same name in different subdirectories would write the same file.
+    name_counts = collections.Counter(fn_base for fn_base, _, _ in mts_files_with_stat)
+    unique_mts_files_with_stat = []
+    for fn_base, mts_file_path, mts_stat in mts_files_with_stat:
+        if name_counts[fn_base] > 1:
+            print("Skipping {}. Another clip has the same name.".format(mts_file_path))
+        else:
+            unique_mts_files_with_stat.append((fn_base, mts_file_path, mts_stat))
+    return unique_mts_files_with_stat
+
+def get_conversions(mts_files_with_stat, out_dir):
+    # Returns (mts file path, mov file path) tuples.
+    return [(mts_file_path, get_mov_file_path(fn_base, out_dir)) for fn_base, mts_file_path, _ in mts_files_with_stat]
+
+def filter_unconverted(mts_files_with_stat, out_dir):
+    # Like make, skip files whose converted file is newer.
+    mov_mtimes = {fp: st.st_mtime for _, fp, st in find_files_with_stat(out_dir, MOV_FILE_ENDING) if st is not None}
+    unconverted = []
+    for fn_base, mts_file_path, mts_stat in mts_files_with_stat:
+        mov_file_path = get_mov_file_path(fn_base, out_dir)
+        mov_mtime = mov_mtimes.get(mov_file_path)
+        if mov_mtime is None or mts_stat is None or mov_mtime < mts_stat.st_mtime:
+            unconverted.append((mts_file_path, mov_file_path))
+    return unconverted
+
+def start_conversion(mts_file_path, mov_file_path, ffmpeg_input_options, ffmpeg_options, threads):
+    # Write to a temporary file first. Otherwise an interrupted conversion would be skipped on the next run.
+    tmp_file_path = mov_file_path + TMP_FILE_ENDING
+    threads_option = ["-threads", str(threads)]
+    cmd = FFMPEG_CMD + threads_option + ffmpeg_input_options + ["-i", mts_file_path] + ffmpeg_options + threads_option + FFMPEG_OUTPUT_FORMAT_OPTIONS + [tmp_file_path]
+    print(" ".join(cmd))
+    return subprocess.Popen(cmd)
+
+def finish_conversion(mov_file_path, p):
+    returncode = p.wait()
+    if returncode == 0:
+        os.replace(mov_file_path + TMP_FILE_ENDING, mov_file_path)
+    else:
+        try:
+            os.remove(mov_file_path + TMP_FILE_ENDING)
+        except FileNotFoundError:
+            pass
+    return returncode
+
+def abort_conversion(mov_file_path, p):
+    # Killing is fine because ffmpeg runs with -nostdin and has no terminal settings to restore.
+    p.kill()
+    finish_conversion(mov_file_path, p) # Removes the temporary file.
+
+def wait_for_conversion(mts_file_path, mov_file_path, p, next_conversion=None):
+    # next_conversion is the (mov file path, process) of a conversion that has already been started.
+    if finish_conversion(mov_file_path, p) != 0:
+        print("ffmpeg returned an error for {}! Aborting.".format(mts_file_path))
+        if next_conversion is not None:
+            abort_conversion(*next_conversion) # Do not leave it running in the background.
+        exit(1)
+
+def convert_mts_files_pipelined(conversions, ffmpeg_input_options, ffmpeg_options, threads):
+    # Start the next ffmpeg process before waiting for the previous one.
+    # This way the I/O of one conversion overlaps with the computation of the other.
+    in_flight = None
+    for mts_file_path, mov_file_path in conversions:
+        p = start_conversion(mts_file_path, mov_file_path, ffmpeg_input_options, ffmpeg_options, threads)
+        if in_flight is not None:
+            wait_for_conversion(*in_flight, next_conversion=(mov_file_path, p))
+        in_flight = (mts_file_path, mov_file_path, p)
+    if in_flight is not None:
+        wait_for_conversion(*in_flight)
+
+def convert_mts_files(conversions, ffmpeg_input_options_string, ffmpeg_options_string, jobs):
+    ffmpeg_input_options = shlex.split(ffmpeg_input_options_string)
+    ffmpeg_options = shlex.split(ffmpeg_options_string)
+    # Share the cores between the parallel jobs to avoid oversubscription.
+    # A single job still runs two processes at a time because of the pipelining.
+    threads = max(1, (os.cpu_count() or 1) // max(2, jobs))
+    if jobs == 1:
+        convert_mts_files_pipelined(conversions, ffmpeg_input_options, ffmpeg_options, threads)
+        return
+    convert_mts_files_parallel(conversions, ffmpeg_input_options, ffmpeg_options, jobs, threads)
+
+def convert_mts_files_parallel(conversions, ffmpeg_input_options, ffmpeg_options, jobs, threads):
+    # Every file is converted by its own ffmpeg process. The processes are started here and the threads only wait for them.
+    # This way no conversion is started anymore after an error.
+    conversions = iter(conversions)
+    running = {} # Future -> (mts file path, process)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while True:
+            for mts_file_path, mov_file_path in itertools.islice(conversions, jobs - len(running)):
+                p = start_conversion(mts_file_path, mov_file_path, ffmpeg_input_options, ffmpeg_options, threads)
+                running[executor.submit(finish_conversion, mov_file_path, p)] = (mts_file_path, p)
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                mts_file_path, _ = running.pop(future)
+                if future.result() != 0:
+                    print("ffmpeg returned an error for {}! Aborting.".format(mts_file_path))
+                    for _, p in running.values():
+                        p.kill() # finish_conversion() then removes their temporary files before the executor shuts down.
+                    exit(1)
 
 def try_mk_dir(out_dir):
     try:
@@ -40,20 +137,32 @@ def try_mk_dir(out_dir):
 
 def main():
     args = parse_args()
-    mts_file_pathes = find_mts_file_pathes(args.dir)
+    mts_files_with_stat = filter_name_clashes(sorted(find_files_with_stat(args.dir, MTS_FILE_ENDING), key=lambda f: f[1]))
+    ffmpeg_input_options = None
     ffmpeg_options = None
     if args.for_sharing:
         # For sharing
-        ffmpeg_options = "-c:v copy -q:v 1 -c:a aac"
+        # The clips of the camera have a fixed structure, so probing a small part of the input is sufficient.
+        ffmpeg_input_options = "-fflags +genpts -analyzeduration 1M -probesize 1M"
+        # Put the index at the start of the file so playback can start before the whole file is loaded.
+        ffmpeg_options = "-c:v copy -q:v 1 -c:a aac -movflags +faststart"
         out_dir = args.dir + "_s"
     else:
         # For editing
+        ffmpeg_input_options = ""
         ffmpeg_options = "-c:v dnxhd -b:v 145M -q:v 1 -c:a pcm_s16be"
         out_dir = args.dir + "_c"
     if args.deinterlace:
         ffmpeg_options += " -vf yadif"
     try_mk_dir(out_dir)
-    convert_mts_files(mts_file_pathes, ffmpeg_options, out_dir)
+    if args.force:
+        conversions = get_conversions(mts_files_with_stat, out_dir)
+    else:
+        conversions = filter_unconverted(mts_files_with_stat, out_dir)
+        num_skipped = len(mts_files_with_stat) - len(conversions)
+        if num_skipped > 0:
+            print("Skipping {} already converted files. Use --force to convert them again.".format(num_skipped))
+    convert_mts_files(conversions, ffmpeg_input_options, ffmpeg_options, max(1, args.jobs))
 
 if __name__ == "__main__":
     main()
@@ -1,13 +1,20 @@
 #!/usr/bin/env python3
 
 import argparse
+import functools
 import os
+import shutil
 import subprocess
 import curses
-import abc
+import select
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
-MTS_FILE_ENDING = ".MTS"
-MOV_FILE_ENDING = ".mov"
+from common import MTS_FILE_ENDING, MOV_FILE_ENDING, find_files, find_files_with_stat
+
+# The player is looked up only once. Popen can only use posix_spawn() with an absolute path to the executable.
+CVLC_CMD = [shutil.which("cvlc") or "cvlc", "--play-and-exit"]
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Tool to quickly check the (converted) footage and remove bad clips in both the original MTS files and converted MOV files.")
@@ -15,44 +22,44 @@ def parse_args():
     parser.add_argument("--read-only", action="store_true", help="Disables delete functionality. Clips can only be watched.")
     return parser.parse_args()
 
-def find_file_pathes(directory, ending):
-    file_pathes = []
-    for d_path, _, f_names in os.walk(directory):
-        for f_name in f_names:
-            f_path = os.path.join(d_path, f_name)
-            if f_path.endswith(ending):
-                file_pathes += [f_path]
-    return file_pathes
-
-def get_file_name_base(file_path, ending):
-    return os.path.basename(file_path)[:-len(ending)]
-
 class Clip:
-    def __init__(self, mov_file_path, mts_file_path, mov_file_size):
+    def __init__(self, mov_file_path, mts_file_path, mov_file_size, file_base_name):
+        # The file name base is the same for both files, find_clips() matches them by it.
         self.mov_file_path = mov_file_path
         self.mts_file_path = mts_file_path
-        assert get_file_name_base(self.mov_file_path, MOV_FILE_ENDING) == get_file_name_base(self.mts_file_path, MTS_FILE_ENDING)
+        self.file_base_name = file_base_name
         self.mov_file_size = mov_file_size
-        self.file_base_name = get_file_name_base(self.mov_file_path, MOV_FILE_ENDING)
+        self.s_file_size = " {:.1f} MB ".format(mov_file_size / (1024 * 1024))
+        self.s_file_size_len = len(self.s_file_size)
         self.played = False
         self.marked_for_del = False
+        self.s_file_name = None # Built on demand, depends on the state.
+
+    def invalidate(self):
+        # Has to be called after changing the state.
+        self.s_file_name = None
+
+    def get_s_file_name(self):
+        if self.s_file_name is None:
+            stat = ""
+            if not self.played:
+                stat += "*"
+            if self.marked_for_del:
+                stat += "D"
+            self.s_file_name = " {:2} {}".format(stat, self.file_base_name)
+        return self.s_file_name
 
 def find_clips(mts_dir, mov_dir):
-    mts_file_pathes = find_file_pathes(mts_dir, MTS_FILE_ENDING)
-    mov_file_pathes = find_file_pathes(mov_dir, MOV_FILE_ENDING)
-    mts_files = {} # File name base (no ending) -> complete path
-    for mts_fp in mts_file_pathes:
-        fn_base = get_file_name_base(mts_fp, MTS_FILE_ENDING)
-        mts_files[fn_base] = mts_fp
+    # Do not descend into the other directory in case one is nested in the other.
+    mts_files = dict(find_files(mts_dir, MTS_FILE_ENDING, {os.path.abspath(mov_dir)})) # File name base (no ending) -> complete path
+    mov_files_with_stat = find_files_with_stat(mov_dir, MOV_FILE_ENDING, {os.path.abspath(mts_dir)})
+    mov_files_with_stat.sort(key=lambda f: f[0]) # By the name shown in the editor.
     clips = []
-    for mov_fp in sorted(mov_file_pathes):
-        fn_base = get_file_name_base(mov_fp, MOV_FILE_ENDING)
-        try:
-            mov_file_size = os.path.getsize(mov_fp)
-        except OSError:
-            mov_file_size = 0
-        if fn_base in mts_files:
-            clips += [Clip(mov_fp, mts_files[fn_base], mov_file_size)]
+    for fn_base, mov_fp, mov_stat in mov_files_with_stat:
+        mts_fp = mts_files.get(fn_base)
+        if mts_fp is not None:
+            mov_file_size = mov_stat.st_size if mov_stat is not None else 0 # The error has already been reported.
+            clips.append(Clip(mov_fp, mts_fp, mov_file_size, fn_base))
         else:
             print("Could not find MTS clip for {}.".format(mov_fp))
     return clips
@@ -62,13 +69,81 @@ class Model:
         self.mov_dir = mov_dir
         self.mts_dir = mts_dir
         self.clips = clips
+        # Simplify mov dir name. Only shown in the title bar, but it never changes.
+        self.mov_dir_display = mov_dir[len(mts_dir):] if mov_dir.startswith(mts_dir) else mov_dir
+        self.dirs_text_full = " {} / {}".format(mts_dir, self.mov_dir_display)
 
     def delete_marked_clips(self):
-        to_del = [c for c in self.clips if c.marked_for_del]
-        for c_to_del in to_del:
-            os.remove(c_to_del.mov_file_path)
-            os.remove(c_to_del.mts_file_path)
-            self.clips.remove(c_to_del)
+        del_file_pathes = []
+        remaining_clips = []
+        for c in self.clips:
+            if c.marked_for_del:
+                del_file_pathes += [c.mov_file_path, c.mts_file_path]
+            else:
+                remaining_clips.append(c)
+        # Deleting may block for a while on slow disks or network shares, so delete concurrently.
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(os.remove, del_file_pathes))
+        self.clips = remaining_clips
+
+@functools.lru_cache(maxsize=4096)
+def trunc_text(text, limit):
+    # The same clip names are truncated to the same width on every repaint.
+    if len(text) <= limit: return text
+    elif len(text) >= 3: return text[:limit-3] + "..."
+    else: return "." * limit
+
+def update_normal_mode(vc):
+    pass
+
+def handle_input_normal_mode(vc, enter_pressed):
+    in_buf = vc.in_buf
+    if in_buf.startswith(b":"):
+        # Multi charactar command is being typed in.
+        if enter_pressed:
+            if in_buf == b":w":
+                vc.save()
+            elif in_buf == b":wq":
+                vc.save()
+                vc.exit_no_save()
+            elif in_buf == b":q":
+                vc.exit_no_save()
+            elif in_buf == b":q!" or in_buf == b":cq":
+                vc.exit_no_save_forced()
+            else:
+                vc.set_msg("Unknown command: '{}'.".format(in_buf.decode()))
+            return True
+        else:
+            return False # Command not yet complete.
+    elif in_buf == b"j":
+        vc.move_cursor_line(1)
+    elif in_buf == b"k":
+        vc.move_cursor_line(-1)
+    elif in_buf == b"g":
+        vc.move_cursor_line_all_up()
+    elif in_buf == b"G":
+        vc.move_cursor_line_all_down()
+    elif in_buf == b"l":
+        vc.move_cursor_line(vc.rows_editor - 1)
+    elif in_buf == b"h":
+        vc.move_cursor_line(-(vc.rows_editor - 1))
+    elif in_buf == b" ":
+        vc.play_at_cursor_line()
+        vc.switch_mode(CursesViewController.MODE_PLAY)
+    elif in_buf == b"d":
+        vc.toggle_del_at_cursor_line()
+
+    return True
+
+def update_play_mode(vc):
+    if vc.play_proc.poll() is not None:
+        vc.stop_playing()
+
+def handle_input_play_mode(vc, enter_pressed):
+    if vc.in_buf == b" ":
+        vc.play_proc.kill()
+        vc.stop_playing()
+    return True
 
 class CursesViewController:
     CP_MARK = 1
@@ -76,104 +151,37 @@ class CursesViewController:
     CP_PLAY = 6
     CP_DEL = 4
 
-    class Mode(abc.ABC):
-        def __init__(self, vc, name, cursor_line_attr=0, cursor_line_del_attr=None):
-            self.vc = vc
-            self.name = name
-            self.cursor_line_attr = cursor_line_attr
-            if cursor_line_del_attr is not None:
-                self.cursor_line_del_attr = cursor_line_del_attr
-            else:
-                self.cursor_line_del_attr = curses.color_pair(CursesViewController.CP_DEL)
-
-        @abc.abstractmethod
-        def update(self):
-            pass
-
-        @abc.abstractmethod
-        def handle_input(self, enter_pressed):
-            return True
+    # Modes: (name, update function, input handler, color pair of cursor line, input timeout in ms)
+    # The input handler returns whether the input buffer is consumed.
+    # The update function is called when the input times out. Without timeout, waiting for input blocks.
+    MODE_NORMAL = ("NORMAL", update_normal_mode, handle_input_normal_mode, CP_MARK, -1)
+    MODE_PLAY = ("PLAY", update_play_mode, handle_input_play_mode, CP_PLAY, 500) # Handles resizes while playing. Without pidfd, also polls the player in case the signal is missed.
 
-    class PlayMode(Mode):
-        def __init__(self, vc, p):
-            super().__init__(vc, "PLAY", curses.color_pair(CursesViewController.CP_PLAY))
-            self.p = p
+    TITLE_LABEL = " MTS / MOV: "
+    PROG_NAME = " review "
 
-        def update(self):
-            if self.p.poll() is not None:
-                self.vc.switch_mode(CursesViewController.NormalMode(self.vc))
-
-        def handle_input(self, enter_pressed):
-            if self.vc.in_buf == " ":
-                self.p.kill()
-                self.vc.switch_mode(CursesViewController.NormalMode(self.vc))
-            return True
-
-    class NormalMode(Mode):
-        def __init__(self, vc):
-            super().__init__(vc, "NORMAL", curses.color_pair(CursesViewController.CP_MARK))
-
-        def update(self):
-            pass
-
-        def handle_input(self, enter_pressed):
-            in_buf = self.vc.in_buf
-            if in_buf.startswith(":"):
-                # Multi charactar command is being typed in.
-                if enter_pressed:
-                    if in_buf == ":w":
-                        self.vc.save()
-                    elif in_buf == ":wq":
-                        self.vc.save()
-                        self.vc.exit_no_save()
-                    elif in_buf == ":q":
-                        self.vc.exit_no_save()
-                    elif in_buf == ":q!" or in_buf == ":cq":
-                        self.vc.exit_no_save_forced()
-                    else:
-                        self.vc.set_msg("Unknown command: '{}'.".format(in_buf))
-                    return True
-                else:
-                    return False # Command not yet complete.
-            elif in_buf == "j":
-                self.vc.move_cursor_line(1)
-            elif in_buf == "k":
-                self.vc.move_cursor_line(-1)
-            elif in_buf == "g":
-                self.vc.move_cursor_line_all_up()
-            elif in_buf == "G":
-                self.vc.move_cursor_line_all_down()
-            elif in_buf == "l":
-                self.vc.move_cursor_line(self.vc.rows_editor - 1)
-            elif in_buf == "h":
-                self.vc.move_cursor_line(-(self.vc.rows_editor - 1))
-            elif in_buf == " ":
-                p = self.vc.play_at_cursor_line()
-                self.vc.switch_mode(CursesViewController.PlayMode(self.vc, p))
-            elif in_buf == "d":
-                self.vc.toggle_del_at_cursor_line()
-
-            return True
+    colors_initialized = False # Color pairs are global to curses, so they only need to be set up once.
 
     def __init__(self, scr, model, read_only):
         self.scr = scr
         self.model = model
         self.read_only = read_only
         self.exit = False
-        self.in_buf = ""
+        self.in_buf = bytearray() # Changed in place on input.
         self.last_in = 0
         self.msg = None
         self.cursor_line = 0
         self.top_v_line = 0
+        self.play_proc = None
+        self.play_pidfd = None # Becomes readable when the player exits.
+        # The handler does nothing, but the signal interrupts getch() as soon as the player exits. Only needed without pidfd.
+        signal.signal(signal.SIGCHLD, lambda *_: None)
         self.init_curses()
-        self.mode = CursesViewController.NormalMode(self)
+        self.set_mode(CursesViewController.MODE_NORMAL)
         self.reset()
 
     def __trunc_text(self, text, length):
-        limit = max(0, min(self.cols, length))
-        if len(text) <= limit: return text
-        elif len(text) >= 3: return text[:limit-3] + "..."
-        else: return "." * limit
+        return trunc_text(text, max(0, min(self.cols, length)))
 
     def __crop_text(self, text, length=999999):
         limit = max(0, min(self.cols, length))
@@ -186,110 +194,162 @@ class CursesViewController:
             return
         if col < 0 or row < 0:
             return
-        if len(text) + col > cols:
-            text = text[:cols - col]
-        w.addstr(row, col, text, fmt)
+        w.addnstr(row, col, text, cols - col, fmt) # Truncates without slicing.
 
     def init_curses(self):
-        self.rows, self.cols = self.scr.getmaxyx()
+        # Only called once. Everything that depends on the terminal size is done in reset().
         curses.curs_set(0)
-        self.scr.timeout(100)
-        curses.use_default_colors()
-        curses.init_pair(CursesViewController.CP_MARK, 11, 15) # 12, 15
-        curses.init_pair(CursesViewController.CP_BAR, 12, 7) # -1, 7
-        curses.init_pair(CursesViewController.CP_PLAY, curses.COLOR_GREEN, curses.COLOR_WHITE) # 2, 7
-        curses.init_pair(CursesViewController.CP_DEL, curses.COLOR_RED, -1) # curses.COLOR_RED, -1
-        #if self.rows < 4 or self.cols < 25: exit(-1) # Should not be necessary.
+        if not CursesViewController.colors_initialized:
+            curses.use_default_colors()
+            curses.init_pair(CursesViewController.CP_MARK, 11, 15) # 12, 15
+            curses.init_pair(CursesViewController.CP_BAR, 12, 7) # -1, 7
+            curses.init_pair(CursesViewController.CP_PLAY, curses.COLOR_GREEN, curses.COLOR_WHITE) # 2, 7
+            curses.init_pair(CursesViewController.CP_DEL, curses.COLOR_RED, -1) # curses.COLOR_RED, -1
+            CursesViewController.colors_initialized = True
 
     def reset_editor(self):
         self.cursor_line = max(0, min(len(self.model.clips) - 1, self.cursor_line))
         self.top_v_line = max(0, min(len(self.model.clips) - 1, self.top_v_line))
         self.rows_editor = self.rows - 2
-        self.pad_editor = curses.newpad(len(self.model.clips) + 1, self.cols)
-        for i, _ in enumerate(self.model.clips):
-            self.refresh_line(i)
-        self.refresh_editor()
+        # Only holds the visible lines. A pad with all clips would need memory for every clip.
+        self.win_editor = curses.newwin(self.rows_editor, self.cols + 1, 1, 0)
+        self.win_editor.leaveok(True) # The cursor is hidden anyway, so do not move it after writing.
+        self.win_editor.idlok(True) # Allow curses to scroll with terminal commands.
+        self.dirty_lines = set()
+        self.line_cache = {} # Row of the window -> what was last rendered to it
+        self.rendered_top_v_line = None # Forces rendering all rows.
 
     def reset(self):
-        # Build windows and pads.
+        self.rows, self.cols = self.scr.getmaxyx()
+        trunc_text.cache_clear() # Truncations for the old width are not needed anymore.
+        #if self.rows < 4 or self.cols < 25: exit(-1) # Should not be necessary.
+        # Build windows.
         self.scr.clear()
-        self.scr.refresh()
+        self.scr.noutrefresh() # Written together with the other windows by doupdate() in loop().
         # Title bar
         self.win_title_bar = curses.newwin(1, self.cols + 1, 0, 0)
+        self.win_title_bar.leaveok(True)
         self.refresh_title_bar()
         # Editor
         self.reset_editor()
         # Status bar
         self.win_status_bar = curses.newwin(1, self.cols + 1, self.rows - 1, 0)
+        self.win_status_bar.leaveok(True)
+        self.shown_status = None
         self.refresh_status_bar()
 
     def refresh_title_bar(self):
-        self.win_title_bar.clear()
-        label = self.__crop_text(" MTS / MOV: ")
-        prog_name = self.__crop_text(" review ")
-        # Simplify mov dir name
-        if self.model.mov_dir.startswith(self.model.mts_dir):
-            mov_dir_truncated = self.model.mov_dir[len(self.model.mts_dir):]
-        else:
-            mov_dir_truncated = self.model.mov_dir
+        self.win_title_bar.erase()
+        label = self.__crop_text(CursesViewController.TITLE_LABEL)
+        label_len = len(label)
+        prog_name = self.__crop_text(CursesViewController.PROG_NAME)
+        prog_name_col = self.cols - len(prog_name)
+        bar_attr = curses.color_pair(CursesViewController.CP_BAR) | curses.A_REVERSE
         # Left aligned
-        self.__s_addstr(self.win_title_bar, 0, 0, label, curses.color_pair(CursesViewController.CP_BAR) | curses.A_REVERSE)
-        dirs_text = self.__trunc_text(" {} / {}".format(self.model.mts_dir, mov_dir_truncated), self.cols - len(label) - len(prog_name))
-        self.__s_addstr(self.win_title_bar, 0, len(label), dirs_text)
+        self.__s_addstr(self.win_title_bar, 0, 0, label, bar_attr)
+        dirs_text = self.__trunc_text(self.model.dirs_text_full, prog_name_col - label_len)
+        self.__s_addstr(self.win_title_bar, 0, label_len, dirs_text)
         # Right aligned
-        self.__s_addstr(self.win_title_bar, 0, self.cols - len(prog_name), prog_name, curses.color_pair(CursesViewController.CP_BAR) | curses.A_REVERSE)
-        self.win_title_bar.refresh()
+        self.__s_addstr(self.win_title_bar, 0, prog_name_col, prog_name, bar_attr)
+        self.win_title_bar.noutrefresh()
 
     def refresh_status_bar(self):
-        self.win_status_bar.clear()
-        padded_mode_name = " {} ".format(self.mode.name)
+        # Skip redrawing if nothing changed, e. g. when a key is held down.
+        status = (self.mode_name, self.last_in, bytes(self.in_buf), self.msg) # Copy, the buffer changes in place.
+        if status == self.shown_status:
+            return
+        self.shown_status = status
+        self.win_status_bar.erase()
+        padded_mode_name = " {} ".format(self.mode_name)
+        padded_mode_name_len = len(padded_mode_name)
         s_last_in = " {} ".format(self.last_in)
-        self.__s_addstr(self.win_status_bar, 0, 0, self.__trunc_text(padded_mode_name, self.cols - len(s_last_in)), curses.color_pair(CursesViewController.CP_BAR) | curses.A_REVERSE | curses.A_BOLD)
-        if self.in_buf == "" and self.msg is not None:
-            self.__s_addstr(self.win_status_bar, 0, len(padded_mode_name), " {} ".format(self.msg))
+        s_last_in_col = self.cols - len(s_last_in)
+        bar_attr = curses.color_pair(CursesViewController.CP_BAR) | curses.A_REVERSE
+        self.__s_addstr(self.win_status_bar, 0, 0, self.__trunc_text(padded_mode_name, s_last_in_col), bar_attr | curses.A_BOLD)
+        if not self.in_buf and self.msg is not None:
+            self.__s_addstr(self.win_status_bar, 0, padded_mode_name_len, " {} ".format(self.msg))
         else:
             # Show current buffer.
-            self.__s_addstr(self.win_status_bar, 0, len(padded_mode_name), " {} ".format(self.in_buf))
-        self.__s_addstr(self.win_status_bar, 0, self.cols - len(s_last_in), s_last_in, curses.color_pair(CursesViewController.CP_BAR) | curses.A_REVERSE)
-        self.win_status_bar.refresh()
+            self.__s_addstr(self.win_status_bar, 0, padded_mode_name_len, " {} ".format(self.in_buf.decode()))
+        self.__s_addstr(self.win_status_bar, 0, s_last_in_col, s_last_in, bar_attr)
+        self.win_status_bar.noutrefresh()
 
     def refresh_line(self, i):
-        if i < 0 or i >= len(self.model.clips): return
-        # Erase old line.
-        self.pad_editor.move(i, 0)
-        self.pad_editor.clrtoeol()
+        row = i - self.top_v_line
+        if row < 0 or row >= self.rows_editor: return # Not visible. Rendered when scrolled into view.
+        if i >= len(self.model.clips):
+            self.render_row(row, None) # Below the last clip.
+            return
         clip = self.model.clips[i]
-        s_file_size = " {:.1f} MB ".format(clip.mov_file_size / (1024 * 1024))
-        stat = ""
-        if not clip.played:
-            stat += "*"
-        if clip.marked_for_del:
-            stat += "D"
-        s_file_name = " {:2} {}".format(stat, clip.file_base_name)
-        s_file_name = self.__trunc_text(s_file_name, self.cols - len(s_file_size))
+        s_file_size_col = self.cols - clip.s_file_size_len
+        s_file_name = self.__trunc_text(clip.get_s_file_name(), s_file_size_col)
         attr = 0
         if i == self.cursor_line:
             if clip.marked_for_del:
-                attr |= self.mode.cursor_line_del_attr
+                attr |= curses.color_pair(CursesViewController.CP_DEL)
             else:
-                attr |= self.mode.cursor_line_attr
+                attr |= self.cursor_line_attr
             attr |= curses.A_REVERSE
-            s_file_name = s_file_name + " " * (max(0, self.cols - len(s_file_name)))
         else:
             if clip.marked_for_del:
                 attr |= curses.color_pair(CursesViewController.CP_DEL)
         if not clip.played: attr |= curses.A_BOLD
-        self.__s_addstr(self.pad_editor, i, 0, s_file_name, attr)
-        self.__s_addstr(self.pad_editor, i, self.cols - len(s_file_size), s_file_size, attr)
+        self.render_row(row, (s_file_name, s_file_size_col, clip.s_file_size, attr, i == self.cursor_line))
+
+    def render_row(self, row, rendered):
+        # Skip rewriting the row if the window already contains it. None is an empty row.
+        if self.line_cache.get(row) == rendered:
+            return
+        self.line_cache[row] = rendered
+        # Erase old line.
+        self.win_editor.move(row, 0)
+        self.win_editor.clrtoeol()
+        if rendered is not None:
+            s_file_name, s_file_size_col, s_file_size, attr, highlight = rendered
+            self.__s_addstr(self.win_editor, row, 0, s_file_name, attr)
+            gap = s_file_size_col - len(s_file_name)
+            if highlight and gap > 0:
+                self.win_editor.chgat(row, len(s_file_name), gap, attr) # Extend the highlight without writing spaces.
+            self.__s_addstr(self.win_editor, row, s_file_size_col, s_file_size, attr)
 
     def refresh_editor(self):
-        self.pad_editor.refresh(self.top_v_line, 0, 1, 0, self.rows_editor, self.cols)
+        self.win_editor.noutrefresh()
+
+    def scroll_editor(self, inc):
+        # Moves the content of the window and marks the rows that scrolled into view as dirty.
+        self.win_editor.scrollok(True)
+        self.win_editor.scroll(inc)
+        self.win_editor.scrollok(False)
+        self.line_cache = {row - inc: r for row, r in self.line_cache.items() if 0 <= row - inc < self.rows_editor}
+        if inc > 0:
+            exposed_rows = range(self.rows_editor - inc, self.rows_editor)
+        else:
+            exposed_rows = range(0, -inc)
+        self.dirty_lines.update(self.top_v_line + row for row in exposed_rows)
+
+    def mark_dirty(self, i):
+        self.dirty_lines.add(i)
+
+    def flush_dirty_lines(self):
+        # Renders the visible dirty lines. The others are rendered anyway when they scroll into view.
+        if self.rendered_top_v_line is None or abs(self.top_v_line - self.rendered_top_v_line) >= self.rows_editor:
+            self.dirty_lines.update(range(self.top_v_line, self.top_v_line + self.rows_editor))
+        elif self.top_v_line != self.rendered_top_v_line:
+            self.scroll_editor(self.top_v_line - self.rendered_top_v_line)
+        self.rendered_top_v_line = self.top_v_line
+        for i in range(self.top_v_line, self.top_v_line + self.rows_editor):
+            if i in self.dirty_lines:
+                self.refresh_line(i)
+        self.dirty_lines.clear()
+        self.refresh_editor()
 
     def move_cursor_line(self, inc):
-        prev_cursor_line = self.cursor_line
-        self.cursor_line = max(0, min(len(self.model.clips) - 1, self.cursor_line + inc))
-        self.refresh_line(prev_cursor_line)
-        self.refresh_line(self.cursor_line)
+        cursor_line = max(0, min(len(self.model.clips) - 1, self.cursor_line + inc))
+        if cursor_line == self.cursor_line:
+            return # E. g. at the end of the list.
+        self.mark_dirty(self.cursor_line)
+        self.cursor_line = cursor_line
+        self.mark_dirty(self.cursor_line)
         # Scroll window if needed.
         lines_below_window = (self.cursor_line - self.top_v_line) - (self.rows - 3)
         lines_above_window = self.top_v_line - self.cursor_line
@@ -297,29 +357,37 @@ class CursesViewController:
             self.top_v_line += lines_below_window
         elif lines_above_window > 0:
             self.top_v_line -= lines_above_window
-        self.refresh_editor()
 
     def move_cursor_line_all_up(self):
-        prev_cursor_line = self.cursor_line
+        self.mark_dirty(self.cursor_line)
         self.cursor_line = 0
         self.top_v_line = 0
-        self.refresh_line(prev_cursor_line)
-        self.refresh_line(self.cursor_line)
-        self.refresh_editor()
+        self.mark_dirty(self.cursor_line)
 
     def move_cursor_line_all_down(self):
-        prev_cursor_line = self.cursor_line
+        self.mark_dirty(self.cursor_line)
         self.cursor_line = len(self.model.clips) - 1
         self.top_v_line = max(0, self.cursor_line - (self.rows_editor - 1))
-        self.refresh_line(prev_cursor_line)
-        self.refresh_line(self.cursor_line)
-        self.refresh_editor()
+        self.mark_dirty(self.cursor_line)
 
     def play_at_cursor_line(self):
         clip = self.model.clips[self.cursor_line]
         mov_file_path = clip.mov_file_path
         clip.played = True
-        return subprocess.Popen(["cvlc", "--play-and-exit", mov_file_path], stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        clip.invalidate()
+        self.mark_dirty(self.cursor_line)
+        # Without closing the file descriptors, Popen can use posix_spawn() instead of fork() and exec().
+        self.play_proc = subprocess.Popen(CVLC_CMD + [mov_file_path], stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT, close_fds=False)
+        try:
+            self.play_pidfd = os.pidfd_open(self.play_proc.pid)
+        except (AttributeError, OSError):
+            self.play_pidfd = None # Needs Linux 5.3. Otherwise rely on SIGCHLD and the input timeout.
+
+    def stop_playing(self):
+        if self.play_pidfd is not None:
+            os.close(self.play_pidfd)
+            self.play_pidfd = None
+        self.switch_mode(CursesViewController.MODE_NORMAL)
 
     def toggle_del_at_cursor_line(self):
         if self.read_only:
@@ -327,18 +395,24 @@ class CursesViewController:
             return
         clip = self.model.clips[self.cursor_line]
         clip.marked_for_del = not clip.marked_for_del
-        self.refresh_line(self.cursor_line)
-        self.refresh_editor()
+        clip.invalidate()
+        self.mark_dirty(self.cursor_line)
 
     def set_msg(self, msg):
         self.msg = msg
         self.refresh_status_bar()
 
+    def set_mode(self, mode):
+        self.mode_name, self.mode_update, self.mode_handle_input, cp_cursor_line, self.mode_timeout = mode
+        self.cursor_line_attr = curses.color_pair(cp_cursor_line)
+        self.scr.timeout(self.mode_timeout)
+
     def switch_mode(self, mode):
-        self.mode = mode
+        prev_cursor_line_attr = self.cursor_line_attr
+        self.set_mode(mode)
         self.refresh_status_bar()
-        self.refresh_line(self.cursor_line)
-        self.refresh_editor()
+        if self.cursor_line_attr != prev_cursor_line_attr:
+            self.mark_dirty(self.cursor_line)
 
     def exit_no_save_forced(self):
         self.exit = True
@@ -358,28 +432,40 @@ class CursesViewController:
         self.model.delete_marked_clips()
         if len(self.model.clips) == 0:
             self.exit = True
-        self.reset()
+            return
+        self.cursor_line = min(len(self.model.clips) - 1, self.cursor_line)
+        self.top_v_line = max(0, min(len(self.model.clips) - 1, self.top_v_line))
+        # Lines below deleted ones moved up. Rows that still show the same clip are skipped when rendering.
+        self.dirty_lines.update(range(self.top_v_line, self.top_v_line + self.rows_editor))
 
     def loop(self):
         while not self.exit:
+            # The windows only stage their changes, write them all to the terminal at once.
+            self.flush_dirty_lines()
+            curses.doupdate()
+            if self.play_pidfd is not None:
+                # Sleep until there is input or the player exits. Then getch() must not wait anymore.
+                # The signal of a resize does not interrupt select(), so it still needs the timeout to handle it.
+                select.select([sys.stdin, self.play_pidfd], [], [], self.mode_timeout / 1000)
+                self.scr.timeout(0)
             ch = self.scr.getch()
             if ch != -1:
                 self.msg = None # Reset error message.
-                if ch == curses.KEY_RESIZE:
+                if ch == curses.KEY_RESIZE and self.scr.getmaxyx() != (self.rows, self.cols):
                     # Terminal has been resized. Reset view.
-                    self.init_curses()
+                    # Some terminals also send KEY_RESIZE without a size change, e. g. on focus changes.
                     self.reset()
                 self.last_in = ch
                 if 0x20 <= self.last_in <= 0x7e:
-                    self.in_buf += chr(self.last_in) # ASCII input goes to the buffer.
+                    self.in_buf.append(self.last_in) # ASCII input goes to the buffer.
                 elif self.last_in == 263: # Backspace
-                    self.in_buf = self.in_buf[:-1]
+                    del self.in_buf[-1:]
                 enter_pressed = (self.last_in == 0xa)
-                if self.mode.handle_input(enter_pressed):
-                    self.in_buf = "" # Reset buffer.
+                if self.mode_handle_input(self, enter_pressed):
+                    self.in_buf.clear() # Reset buffer.
                 self.refresh_status_bar()
             else:
-                self.mode.update()
+                self.mode_update(self)
 
 def show_curses_ui(scr, model, read_only):
     view_controller = CursesViewController(scr, model, read_only)